@@ -12,6 +12,9 @@ setup(
         "tqdm>=4.64.0",
         "numpy>=1.22.4",
     ],
+    extras_require={
+        "numba": ["numba>=0.57.0"],
+    },
     entry_points={
         "console_scripts": [
             "silhouette-col=silhouette_colouring.src.silhouette_colouring:main"
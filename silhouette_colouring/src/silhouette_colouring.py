@@ -5,21 +5,27 @@ silhouette image and changes the colour of the silhouette to the given hex
 code. It then saves the new image to the output directory.
 """
 import argparse
-import multiprocessing as mp
+import functools
+import os
 import sys
 import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import pandas as pd
 import tqdm
 
 from silhouette_colouring.src.utils import (
     load_csv_file,
     parse_arguments,
     discover_files,
+    output_gif_path,
     recolour_file,
 )
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 def main() -> int:
     start_time = time.time()
@@ -29,42 +35,74 @@ def main() -> int:
     input_csv: Path = args.input_csv
 
     color_csv_df: pd.DataFrame = load_csv_file(input_csv)
+    # Map every cell_ID to its (color, cluster), so each file is a dictionary
+    # lookup instead of a scan over the whole DataFrame. The first row of a
+    # duplicated cell_ID is used.
+    unique_cells_df: pd.DataFrame = color_csv_df.drop_duplicates("cell_ID")
+    lookup: dict[str, tuple[str, str]] = dict(
+        zip(
+            unique_cells_df["cell_ID"],
+            zip(unique_cells_df["color"], unique_cells_df["cluster"].astype(str)),
+        )
+    )
     filepaths: list[Path] = discover_files(gif_input_dir, "*.gif")
 
     if len(filepaths) == 0:
         raise FileNotFoundError(f"No GIFs found in {gif_input_dir}")
 
-    n_processes: int = mp.cpu_count()
+    # On a free-threaded Python threads run in parallel and share everything
+    # without pickling, and a few more threads than cores keeps the CPU busy
+    # while other threads wait on reading or writing files. With the GIL, the
+    # Python parts of reading and patching GIFs would serialise the threads,
+    # so processes are used instead.
+    n_cores: int = os.cpu_count() or 1
+    executor: Executor
+    if hasattr(sys, "_is_gil_enabled") and not sys._is_gil_enabled():
+        n_workers: int = min(32, n_cores + 4)
+        executor = ThreadPoolExecutor(max_workers=n_workers)
+    else:
+        n_workers: int = n_cores
+        executor = ProcessPoolExecutor(max_workers=n_workers)
     progress_bar: tqdm.tqdm = tqdm.tqdm(
         total=len(filepaths), desc="Processing GIFs", unit="GIFs"
     )
 
-    def update_progress(*_: object) -> None:
-        progress_bar.update()
-
+    # Resolve the colour and output path of every GIF up front, GIFs of cells
+    # that are not in the CSV are skipped before they reach the workers
     was_successful: list = []
-    with mp.Pool(n_processes) as pool:
-        results = [
-            pool.apply_async(
-                recolour_file,
-                (
-                    filepath,
-                    color_csv_df,
-                    args.output,
-                    args.darkening,
-                    args.light_colour,
-                    args.dark_colour,
-                    args.discover_colours,
-                    args.verbose,
-                ),
-                callback=update_progress,
-            )
-            for filepath in filepaths
-        ]
+    tasks: list[tuple[Path, str, Path]] = []
+    for filepath in filepaths:
+        hit: tuple[str, str] | None = lookup.get(filepath.stem)
+        if hit is None:
+            if args.verbose:
+                print(
+                    f"WARNING: Skipping image ({filepath.name}) due to: "
+                    f"cell_ID not found in CSV",
+                    file=sys.stderr,
+                )
+            was_successful.append(1)
+            progress_bar.update()
+            continue
+        color, cluster = hit
+        tasks.append((filepath, color, output_gif_path(filepath, cluster, args.output)))
+
+    # Everything except the file is the same for every task
+    process_file = functools.partial(
+        recolour_file,
+        darkening_factor=args.darkening,
+        light_colour=args.light_colour,
+        dark_colour=args.dark_colour,
+        discover_colour=args.discover_colours,
+        run_verbose=args.verbose,
+    )
 
-        # Wait for all processes to complete
-        for result in results:
-            was_successful.append(result.get())
+    # Send the tasks to processes in batches to cut the pickling overhead,
+    # thread pools ignore the chunksize
+    chunksize: int = max(1, len(tasks) // (4 * n_workers))
+    with executor:
+        for exit_code in executor.map(process_file, *zip(*tasks), chunksize=chunksize):
+            was_successful.append(exit_code)
+            progress_bar.update()
 
     progress_bar.close()
 
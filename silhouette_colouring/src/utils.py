@@ -3,22 +3,39 @@
 This module contains utility functions for the silhouette colouring project.
 """
 import argparse
+import functools
+import io
+import os
 import struct
 import sys
 from pathlib import Path
-from typing import Tuple
+from typing import TYPE_CHECKING, Tuple
 
 import numpy as np
-import pandas as pd
 from PIL import Image
 
+from silhouette_colouring.src.kernels import recolour_pixels
 from silhouette_colouring.src.validators import validate_args
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-def parse_arguments() -> argparse.Namespace:  # pragma: no cover
+# Types of the CSV columns that are used, the cell_ID is matched against file
+# names so it is read as a string. Clusters and colours repeat across many
+# cells, so those are stored once per unique value.
+_CSV_DTYPES: dict[str, str] = {
+    "cell_ID": "string",
+    "cluster": "category",
+    "color": "category",
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:  # pragma: no cover
     """
-    Parse the command-line arguments and return the values.
-    :return: The command-line arguments (as a Namespace object)
+    Build the command-line parser. It is only built once, later calls return
+    the same parser.
+    :return: The parser for the command-line arguments
     """
     # Create the parser
     parser = argparse.ArgumentParser(description="Change color of GIFs")
@@ -96,50 +113,62 @@ def parse_arguments() -> argparse.Namespace:  # pragma: no cover
         help="Print more information to the console",
     )
 
-    args = parser.parse_args()
+    return parser
+
+
+def parse_arguments() -> argparse.Namespace:  # pragma: no cover
+    """
+    Parse the command-line arguments and return the values.
+    :return: The command-line arguments (as a Namespace object)
+    """
+    args = _build_parser().parse_args()
     validate_args(args)
     return args
 
 
-def csv_is_valid(loaded_csv_df: pd.DataFrame) -> tuple[bool, list[str]]:
+def csv_is_valid(loaded_csv_df: "pd.DataFrame") -> tuple[bool, list[str]]:
     """
     Check if the CSV file is valid by checking if it has the needed columns.
     :param loaded_csv_df: The dataframe to check
     :return: A tuple with a boolean and a list of missing columns
     """
-    valid: bool = True
-    missing_columns: list[str] = []
-    needed_columns: list[str] = ["cell_ID", "cluster", "color"]
-
-    for column in needed_columns:
-        if column not in loaded_csv_df.columns:
-            valid = False
-            missing_columns.append(column)
+    # Look the needed columns up in a set instead of searching the Index
+    columns: set[str] = set(loaded_csv_df.columns)
+    missing_columns: list[str] = [
+        column for column in _CSV_DTYPES if column not in columns
+    ]
 
-    return valid, missing_columns
+    return len(missing_columns) == 0, missing_columns
 
 
-def load_csv_file(path: Path) -> pd.DataFrame:
+def load_csv_file(path: Path) -> "pd.DataFrame":
     """
     Load the CSV file and return a DataFrame
     :param path: Path to the CSV file
     :return: DataFrame
     """
+    # pandas is only needed here, importing it at module level would make
+    # every worker process pay for it
+    import pandas as pd
 
-    # Read the CSV file
-    loaded_csv_df: pd.DataFrame = pd.read_csv(path)
-
-    # Validate the CSV file
-    if len(loaded_csv_df) == 0:
-        raise ValueError(f"CSV file '{path}' is empty")
-
-    # Check if it has the required columns
-    valid, missing_columns = csv_is_valid(loaded_csv_df)
+    # Check the header first, so a CSV without the needed columns fails before
+    # the whole file is parsed
+    valid, missing_columns = csv_is_valid(pd.read_csv(path, nrows=0))
     if not valid:
         raise ValueError(
             f"CSV file '{path}' is missing the following columns: " f"{missing_columns}"
         )
 
+    # Read the CSV file. Only the needed columns are parsed, with fixed types
+    # so pandas does not have to infer them.
+    loaded_csv_df: pd.DataFrame = pd.read_csv(
+        path, usecols=list(_CSV_DTYPES), dtype=_CSV_DTYPES
+    )
+
+    # Validate the CSV file
+    if len(loaded_csv_df) == 0:
+        raise ValueError(f"CSV file '{path}' is empty")
+
     # Return the DataFrame
     return loaded_csv_df
 
@@ -148,20 +177,42 @@ def discover_colours(
     image: Image.Image,
 ) -> tuple[[int, int, int, int], [int, int, int, int]]:
     """
-    Discover the light and dark colours of the image by using the 'getcolors'
-    method of the Image class. We expect that the light colour is the second
-    most common colour and the dark colour is the third most common colour.
+    Discover the light and dark colours of the image by counting how often
+    every colour occurs. We expect that the light colour is the second most
+    common colour and the dark colour is the third most common colour.
     :param image: The image to discover the colours of (PIL Image)
     :return: A tuple with the light and dark colours as RGBA tuples
     """
-    colours: list[tuple] = image.getcolors(256)
-    colours: list[tuple] = sorted(colours, key=lambda x: x[0], reverse=True)
-
-    light_colour: tuple[int, int, int, int] = colours[1][1]
-    dark_colour: tuple[int, int, int, int] = colours[2][1]
+    if image.mode == "P":
+        # Palette images store palette indices, so we count the indices and
+        # look up their colours
+        palette: np.ndarray[np.uint8] = palette_to_rgba(image)
+        index_counts: np.ndarray = np.bincount(np.asarray(image).reshape(-1))
+        indices: np.ndarray = np.flatnonzero(index_counts)
+        # The same colour can be stored in several palette entries, so the
+        # counts are added up per colour
+        packed: np.ndarray[np.uint32] = palette[indices].view(np.uint32).reshape(-1)
+        values, inverse = np.unique(packed, return_inverse=True)
+        counts: np.ndarray = np.bincount(inverse, weights=index_counts[indices])
+        colours: np.ndarray = values.view(np.uint8).reshape(-1, 4)
+    else:
+        # Every RGBA pixel is packed into one uint32, so unique colours are
+        # counted in a single pass without the 256 colour cap of getcolors
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        pixels: np.ndarray[np.uint32] = np.asarray(image).view(np.uint32)
+        values, counts = np.unique(pixels.reshape(-1), return_counts=True)
+        colours: np.ndarray = values.view(np.uint8).reshape(-1, 4)
+
+    # Most common colours first, a tie keeps the colour that sorts first
+    order: np.ndarray = np.argsort(-counts, kind="stable")
+
+    light_colour: tuple[int, int, int, int] = tuple(colours[order[1]].tolist())
+    dark_colour: tuple[int, int, int, int] = tuple(colours[order[2]].tolist())
     return light_colour, dark_colour
 
 
+@functools.lru_cache(maxsize=None)
 def hex_to_rgb(hex_code: str) -> Tuple[int, int, int]:
     """
     Convert a hex code to an RGB tuple using the struct library
@@ -172,6 +223,8 @@ def hex_to_rgb(hex_code: str) -> Tuple[int, int, int]:
     return rgb[0], rgb[1], rgb[2]
 
 
+# typed=True keeps 255 and 255.0 apart, so a float still reaches the type check
+@functools.lru_cache(maxsize=256, typed=True)
 def darken_color(
     red: int, green: int, blue: int, factor: float = 0.1
 ) -> tuple[int, int, int]:
@@ -202,6 +255,68 @@ def darken_color(
     return darkened_red, darkened_green, darkened_blue
 
 
+def pack_rgba(colour: tuple[int, int, int, int]) -> np.uint32:
+    """
+    Pack an RGBA colour into a single uint32 with the same memory layout as a
+    pixel of an RGBA image viewed as uint32
+    :param colour: RGBA tuple (0-255 per channel)
+    :return: The packed colour
+    """
+    return np.uint32(int.from_bytes(bytes(colour), sys.byteorder))
+
+
+def _change_rgba_color(
+    input_image: Image.Image,
+    hex_code: str,
+    darken_factor: float,
+    current_light: tuple[int, int, int, int],
+    current_dark: tuple[int, int, int, int],
+) -> tuple[Image.Image, bool, bool]:
+    """
+    Change the color of an RGBA image and report which colours were found
+    :param input_image: RGBA image to change the color of
+    :param hex_code: Hex code to change the color to (e.g. #FF0000)
+    :param darken_factor: Factor to darken the color by (0-1)
+    :param current_light: The current light colour (RGBA) of the image
+    :param current_dark: The current dark colour (RGBA) of the image
+    :return: New image with the changed color, whether the light colour was
+    found and whether the dark colour was found
+    """
+    # np.asarray gives a read-only view on the pixels Pillow hands over, so the
+    # pixels are not copied a second time. The result is written to a new
+    # buffer that Pillow wraps without copying.
+    data: np.ndarray[np.uint8] = np.asarray(input_image)
+
+    new_light: tuple[int, int, int] = hex_to_rgb(hex_code)
+
+    # Create the new_dark which is the same as the new_light but darker by 10%
+    new_dark: tuple[int, int, int] = darken_color(*new_light, darken_factor)
+
+    # An RGBA pixel is exactly 32 bits, so we compare whole pixels at once
+    # instead of comparing every channel and reducing over the last axis.
+    pixels: np.ndarray[np.uint32] = data.view(np.uint32).reshape(-1)
+    recoloured: np.ndarray[np.uint32] = np.empty_like(pixels)
+
+    # Replace the current_light with the new_light and current_dark with the
+    # new_dark
+    light_found, dark_found = recolour_pixels(
+        pixels,
+        recoloured,
+        pack_rgba(current_light),
+        pack_rgba(current_dark),
+        pack_rgba((*new_light, 255)),
+        pack_rgba((*new_dark, 255)),
+    )
+    del data, pixels
+
+    # Create a new image from the data
+    new_im: Image.Image = Image.frombuffer(
+        "RGBA", input_image.size, recoloured, "raw", "RGBA", 0, 1
+    )
+
+    return new_im, light_found, dark_found
+
+
 def change_color(
     input_image: Image.Image,
     hex_code: str,
@@ -220,29 +335,183 @@ def change_color(
     :param hex_code: Hex code to change the color to (e.g. #FF0000)
     :return:  New image with the changed color
     """
-    data: np.ndarray[np.uint8] = np.array(input_image)
+    new_im, _, _ = _change_rgba_color(
+        input_image, hex_code, darken_factor, current_light, current_dark
+    )
+    return new_im
 
-    new_light: np.ndarray[np.uint8] = np.append(hex_to_rgb(hex_code), 255)
 
-    # Create the new_dark which is the same as the new_light but darker by 10%
-    new_dark: np.ndarray[np.uint8] = np.append(
-        darken_color(
-            int(new_light[0]), int(new_light[1]), int(new_light[2]), darken_factor
-        ),
-        255,
+def palette_to_rgba(image: Image.Image) -> np.ndarray:
+    """
+    Get the palette of a palette ('P' mode) image as an array of RGBA colours.
+    The transparency of the image is applied to the alpha channel.
+    :param image: The palette image (PIL Image)
+    :return: Array with shape (N, 4) where N is the number of palette entries
+    """
+    rgb: np.ndarray[np.uint8] = np.array(image.getpalette(), dtype=np.uint8)
+    rgb = rgb.reshape(-1, 3)
+
+    alpha: np.ndarray[np.uint8] = np.full(len(rgb), 255, dtype=np.uint8)
+    transparency = image.info.get("transparency")
+    if isinstance(transparency, int):
+        if transparency < len(alpha):
+            alpha[transparency] = 0
+    elif isinstance(transparency, bytes):
+        n_entries: int = min(len(transparency), len(alpha))
+        alpha[:n_entries] = np.frombuffer(transparency[:n_entries], dtype=np.uint8)
+
+    return np.column_stack((rgb, alpha))
+
+
+def change_palette_entries(
+    palette: np.ndarray,
+    hex_code: str,
+    darken_factor: float = 0.2,
+    current_light: tuple[int, int, int, int] = (128, 128, 255, 255),
+    current_dark: tuple[int, int, int, int] = (0, 0, 255, 255),
+) -> np.ndarray:
+    """
+    Change the light and dark entries of an RGBA palette to the given hex code
+    and return the new palette. The changed entries become opaque, like the
+    recoloured pixels of an RGBA image.
+    :param palette: Array with shape (N, 4) with the RGBA palette entries
+    :param hex_code: Hex code to change the color to (e.g. #FF0000)
+    :param darken_factor: Factor to darken the color by (0-1)
+    :param current_light: The current color (light) that will be changed
+    :param current_dark: The current color (dark) that will be changed
+    :return: Array with shape (N, 4) with the new RGBA palette entries
+    """
+    new_light: tuple[int, int, int] = hex_to_rgb(hex_code)
+    new_dark: tuple[int, int, int] = darken_color(*new_light, darken_factor)
+
+    # Find the entries before changing any of them, so an entry is only
+    # changed once
+    is_light: np.ndarray[bool] = (palette == current_light).all(axis=1)
+    is_dark: np.ndarray[bool] = (palette == current_dark).all(axis=1)
+
+    # The light colour is written last so it wins if both colours are the
+    # same, like in the pixel kernels
+    new_palette: np.ndarray[np.uint8] = palette.copy()
+    new_palette[is_dark] = (*new_dark, 255)
+    new_palette[is_light] = (*new_light, 255)
+
+    return new_palette
+
+
+def change_palette_color(
+    input_image: Image.Image,
+    hex_code: str,
+    darken_factor: float = 0.2,
+    current_light: tuple[int, int, int, int] = (128, 128, 255, 255),
+    current_dark: tuple[int, int, int, int] = (0, 0, 255, 255),
+) -> Image.Image:
+    """
+    Change the color of a palette ('P' mode) image to the given hex code and
+    return a new image. Only the palette entries are changed, the pixels are
+    left untouched.
+    :param current_dark:  The current color of the image (dark) that will be
+    changed to the new color
+    :param current_light: The current color of the image (light) that will be
+    changed to the new color
+    :param darken_factor:  Factor to darken the color by (0-1)
+    :param input_image: Palette image to change the color of
+    :param hex_code: Hex code to change the color to (e.g. #FF0000)
+    :return:  New image with the changed color
+    """
+    new_palette: np.ndarray[np.uint8] = change_palette_entries(
+        palette_to_rgba(input_image),
+        hex_code,
+        darken_factor,
+        current_light,
+        current_dark,
     )
 
-    # Replace the current_light with the new_light and current_dark with the
-    # new_dark
-    data[(data == current_light).all(axis=2)] = new_light
-    data[(data == current_dark).all(axis=2)] = new_dark
+    new_im: Image.Image = input_image.copy()
+    new_im.putpalette(new_palette[:, :3].tobytes())
 
-    # Create a new image from the data
-    new_im: Image.Image = Image.fromarray(data, mode="RGBA")
+    # Update the transparency for entries that were made opaque
+    transparency = new_im.info.get("transparency")
+    if isinstance(transparency, int):
+        if transparency < len(new_palette) and new_palette[transparency, 3] == 255:
+            del new_im.info["transparency"]
+    elif isinstance(transparency, bytes):
+        new_im.info["transparency"] = new_palette[: len(transparency), 3].tobytes()
 
     return new_im
 
 
+def _skip_gif_sub_blocks(data: bytes, position: int) -> int:
+    """
+    Skip a chain of GIF data sub-blocks, which ends with an empty sub-block
+    :param data: The GIF file contents
+    :param position: Position of the first sub-block
+    :return: Position after the terminating sub-block, -1 if data is truncated
+    """
+    while position < len(data):
+        size: int = data[position]
+        position += 1 + size
+        if size == 0:
+            return position
+    return -1
+
+
+def read_gif_palette(data: bytes) -> tuple[int, np.ndarray] | None:
+    """
+    Read the global colour table of a GIF file. Only GIFs with a single image
+    that uses the global colour table are supported, because then rewriting
+    that table is enough to recolour the GIF.
+    :param data: The GIF file contents
+    :return: A tuple with the offset of the global colour table in the file and
+    the table as RGBA array with shape (N, 4), or None if the GIF is not
+    supported
+    """
+    # Header (6 bytes) and logical screen descriptor (7 bytes)
+    if len(data) < 13 or data[:6] not in (b"GIF87a", b"GIF89a"):
+        return None
+
+    flags: int = data[10]
+    if not flags & 0x80:
+        return None
+
+    palette_offset: int = 13
+    n_entries: int = 2 << (flags & 0x07)
+    position: int = palette_offset + 3 * n_entries
+
+    transparency: int | None = None
+    n_images: int = 0
+    while 0 <= position < len(data) and data[position] != 0x3B:
+        block: int = data[position]
+        if block == 0x21 and position + 2 < len(data):
+            # Extension, the graphic control extension holds the transparency
+            label: int = data[position + 1]
+            position += 2
+            if label == 0xF9 and data[position] == 4 and position + 5 < len(data):
+                if data[position + 1] & 0x01:
+                    transparency = data[position + 4]
+            position = _skip_gif_sub_blocks(data, position)
+        elif block == 0x2C and position + 10 < len(data):
+            # Image descriptor, followed by the LZW minimum code size
+            n_images += 1
+            if n_images > 1 or data[position + 9] & 0x80:
+                return None
+            position = _skip_gif_sub_blocks(data, position + 11)
+        else:
+            return None
+
+    if position < 0 or position >= len(data) or n_images != 1:
+        return None
+
+    rgb: np.ndarray[np.uint8] = np.frombuffer(
+        data, dtype=np.uint8, count=3 * n_entries, offset=palette_offset
+    ).reshape(-1, 3)
+    alpha: np.ndarray[np.uint8] = np.full(n_entries, 255, dtype=np.uint8)
+    # Pillow ignores a transparent index past the colour table, so do we
+    if transparency is not None and transparency < n_entries:
+        alpha[transparency] = 0
+
+    return palette_offset, np.column_stack((rgb, alpha))
+
+
 def discover_files(target_dir: Path, search_query: str) -> list[Path]:
     """
     Discover files in a directory with a search query.
@@ -255,61 +524,56 @@ def discover_files(target_dir: Path, search_query: str) -> list[Path]:
     return list(target_dir.glob(search_query))
 
 
-def recolour_file(
+def write_file(path: Path, data: bytes | memoryview) -> None:
+    """
+    Write data to a file with as few system calls as possible, instead of
+    through a buffered file object
+    :param path: Path of the file, it is created or truncated
+    :param data: The data to write
+    :return: None
+    """
+    flags: int = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    fd: int = os.open(path, flags, 0o666)
+    try:
+        view: memoryview = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
+def output_gif_path(filepath: Path, cluster: str, output_dir: Path) -> Path:
+    """
+    Get the path the recoloured GIF is saved to
+    :param filepath: filepath to the original GIF
+    :param cluster: cluster of the cell, used as prefix of the filename
+    :param output_dir: output directory where the GIF will be saved
+    :return: Path of the recoloured GIF
+    """
+    gif_filename: str = filepath.name.replace("-sil", "-colored").replace(" ", "_")
+    return output_dir / (cluster + "_" + gif_filename)
+
+
+def _check_colours_found(
     filepath: Path,
-    reference_df: pd.DataFrame,
-    output_dir: Path,
-    darkening_factor: float,
     light_colour: tuple[int, int, int, int],
     dark_colour: tuple[int, int, int, int],
-    discover_colour: bool,
+    light_found: bool,
+    dark_found: bool,
     run_verbose: bool,
-) -> int:  # pragma: no cover
+) -> int:
     """
-    Process a file by changing the color of the GIF and saving it to the output
+    Get the exit code for an image given which of its colours were found
+    :param filepath: filepath to the GIF, used in the warning
+    :param light_colour: RGBA tuple of the light colour
+    :param dark_colour: RGBA tuple of the dark colour
+    :param light_found: Whether the light colour is in the image
+    :param dark_found: Whether the dark colour is in the image
     :param run_verbose: Run verbose mode (which shows more information)
-    :param discover_colour: Discover the colour of the GIF
-    :param dark_colour: RGBA tuple of the dark colour to use when changing the
-    color of the GIF
-    :param light_colour: RGBA tuple of the light colour to use when changing
-    the color of the GIF
-    :param filepath: filepath to the GIF
-    :param reference_df: reference dataframe that will be used to change the
-    color of the GIF
-    :param output_dir: output directory where the GIF will be saved
-    :param darkening_factor: darkening factor to use when
-    changing the color of the nucleus
-    :return: Exit code: 0 = success, 1 = cell_ID not found in reference_df,
-    2 = light colour not in image, 3 = dark colour not in image
-
+    :return: Exit code: 0 = both found, 2 = light colour not in image,
+    3 = dark colour not in image
     """
-
-    # Find the row in the reference_df
-    row: pd.Series = reference_df.loc[reference_df["cell_ID"] == filepath.stem]
-
-    # Check if the row exists
-    if len(row) == 0:
-        if run_verbose:
-            print(
-                f"WARNING: Skipping image ({filepath.name}) due to: "
-                f"cell_ID not found in CSV",
-                file=sys.stderr,
-            )
-        return 1
-
-    original_image: Image.Image = Image.open(filepath).convert("RGBA")
-    if discover_colour:
-        light_colour, dark_colour = discover_colours(original_image)
-        if run_verbose:
-            print(
-                f"INFO: Discovered light colour (RGBA): {light_colour} "
-                f"and dark colour (RGBA): {dark_colour} for image: {filepath.name}"
-            )
-
-    # Get the colors from the original image
-    colours = [x[1] for x in original_image.getcolors(256)]
-    # Check if the light and dark colours are in the original image
-    if light_colour not in colours:
+    if not light_found:
         if run_verbose:
             print(
                 f"WARNING: Skipping image ({filepath.name}) due to: "
@@ -318,7 +582,7 @@ def recolour_file(
             )
         return 2
 
-    if dark_colour not in colours:
+    if not dark_found:
         if run_verbose:
             print(
                 f"WARNING: Skipping image ({filepath.name}) due to: "
@@ -327,24 +591,140 @@ def recolour_file(
             )
         return 3
 
-    colored_image: Image.Image = change_color(
-        original_image,
-        row["color"].iloc[0],
-        darkening_factor,
-        light_colour,
-        dark_colour,
-    )
+    return 0
 
-    cluster = str(row["cluster"].iloc[0])
-    gif_filename: str = filepath.name.replace("-sil", "-colored").replace(" ", "_")
 
-    output_gif_path: Path = output_dir / (cluster + "_" + gif_filename)
+def _open_image(data: bytes) -> Image.Image:
+    """
+    Open an image for recolouring. GIFs are usually palette images, for those
+    we only have to change the palette. Other images are converted to RGBA and
+    changed pixel by pixel.
+    :param data: The image file contents
+    :return: The image, in 'P' or 'RGBA' mode
+    """
+    image: Image.Image = Image.open(io.BytesIO(data))
+    if image.mode not in ("P", "RGBA"):
+        image = image.convert("RGBA")
+    return image
+
+
+def recolour_file(
+    filepath: Path,
+    color: str,
+    output_path: Path,
+    darkening_factor: float,
+    light_colour: tuple[int, int, int, int],
+    dark_colour: tuple[int, int, int, int],
+    discover_colour: bool,
+    run_verbose: bool,
+) -> int:  # pragma: no cover
+    """
+    Process a file by changing the color of the GIF and saving it to the output
+    :param run_verbose: Run verbose mode (which shows more information)
+    :param discover_colour: Discover the colour of the GIF
+    :param dark_colour: RGBA tuple of the dark colour to use when changing the
+    color of the GIF
+    :param light_colour: RGBA tuple of the light colour to use when changing
+    the color of the GIF
+    :param filepath: filepath to the GIF
+    :param color: hex code the GIF will be changed to
+    :param output_path: path where the GIF will be saved
+    :param darkening_factor: darkening factor to use when
+    changing the color of the nucleus
+    :return: Exit code: 0 = success, 2 = light colour not in image,
+    3 = dark colour not in image
+
+    """
+
+    data: bytes = filepath.read_bytes()
+
+    # A plain GIF can be recoloured by rewriting its global colour table in the
+    # file, without decoding or encoding the image. Discovering the colours
+    # needs the pixels, so that always goes through Pillow.
+    gif_palette: tuple[int, np.ndarray] | None = None
+    if not discover_colour:
+        gif_palette = read_gif_palette(data)
+
+    original_image: Image.Image | None = None
+    if gif_palette is not None:
+        palette_offset, palette = gif_palette
+        colours = set(map(tuple, palette.tolist()))
+    else:
+        original_image = _open_image(data)
+
+        if discover_colour:
+            light_colour, dark_colour = discover_colours(original_image)
+            if run_verbose:
+                print(
+                    f"INFO: Discovered light colour (RGBA): {light_colour} "
+                    f"and dark colour (RGBA): {dark_colour} "
+                    f"for image: {filepath.name}"
+                )
+
+        # Get the colors from the original image. A palette image lists its
+        # colours in the palette, other images are checked while recolouring
+        colours = None
+        if original_image.mode == "P":
+            colours = set(map(tuple, palette_to_rgba(original_image).tolist()))
+
+    # Check if the light and dark colours are in the original image. The
+    # pixels of an RGBA image are only checked while they are recoloured, so
+    # the image is not scanned twice.
+    if colours is not None:
+        exit_code: int = _check_colours_found(
+            filepath,
+            light_colour,
+            dark_colour,
+            light_colour in colours,
+            dark_colour in colours,
+            run_verbose,
+        )
+        if exit_code != 0:
+            return exit_code
+
+    if gif_palette is not None:
+        new_palette: np.ndarray[np.uint8] = change_palette_entries(
+            palette, color, darkening_factor, light_colour, dark_colour
+        )
+        # Only the colour table is patched. If the transparent entry was
+        # recoloured, the transparency has to go as well, Pillow takes care of
+        # that.
+        if np.array_equal(new_palette[:, 3], palette[:, 3]):
+            new_rgb: bytes = new_palette[:, :3].tobytes()
+            write_file(
+                output_path,
+                data[:palette_offset] + new_rgb + data[palette_offset + len(new_rgb) :],
+            )
+            return 0
+        original_image = _open_image(data)
 
-    # Save colored image
-    colored_image.save(output_gif_path, format="GIF")
+    if original_image.mode == "P":
+        colored_image: Image.Image = change_palette_color(
+            original_image, color, darkening_factor, light_colour, dark_colour
+        )
+    else:
+        colored_image, light_found, dark_found = _change_rgba_color(
+            original_image, color, darkening_factor, light_colour, dark_colour
+        )
+        exit_code = _check_colours_found(
+            filepath, light_colour, dark_colour, light_found, dark_found, run_verbose
+        )
+        if exit_code != 0:
+            original_image.close()
+            colored_image.close()
+            return exit_code
 
+    # The original is no longer needed, close it before encoding so a worker
+    # only holds one image at a time
     original_image.close()
+
+    # Save colored image. The palette is already final, so skip Pillow's
+    # palette optimisation pass. Encoding to memory first lets the file be
+    # written with a single write call.
+    buffer: io.BytesIO = io.BytesIO()
+    colored_image.save(buffer, format="GIF", optimize=False)
     colored_image.close()
+    write_file(output_path, buffer.getbuffer())
 
     return 0
 
@@ -355,7 +735,14 @@ __all__ = [
     "discover_colours",
     "hex_to_rgb",
     "darken_color",
+    "pack_rgba",
     "change_color",
+    "palette_to_rgba",
+    "change_palette_entries",
+    "change_palette_color",
+    "read_gif_palette",
     "discover_files",
+    "write_file",
+    "output_gif_path",
     "recolour_file",
 ]
@@ -1,45 +1,70 @@
 import argparse
+import os
+import re
+import stat
 import sys
 from pathlib import Path
 
+# Three or four comma-separated integers of at most three digits, the common
+# case of a valid colour
+_COLOUR_RE: re.Pattern = re.compile(r"(\d{1,3}),(\d{1,3}),(\d{1,3})(?:,(\d{1,3}))?")
+
+# Colours used when --light-colour or --dark-colour is not given
+_DEFAULT_LIGHT_COLOUR: str = "128,128,255,255"
+_DEFAULT_DARK_COLOUR: str = "0,0,255,255"
+
+
+def _stat_mode(path: Path) -> int | None:
+    # One stat call tells both whether the path exists and what it is
+    try:
+        return os.stat(path).st_mode
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
 
 def validate_input_csv(input_csv: Path) -> None:
-    if not input_csv.exists():
+    mode: int | None = _stat_mode(input_csv)
+    if mode is None:
         raise FileNotFoundError(
             f"CSV path '{input_csv}' "
             f"does not exist. Are you sure this is the right location?"
         )
 
-    # input_csv should be a csv file
-    if input_csv.suffix != ".csv":
+    # input_csv should be a csv file, and not a directory named like one
+    if input_csv.suffix != ".csv" or stat.S_ISDIR(mode):
         raise ValueError(f"Input CSV '{input_csv}' " f"is not a CSV file")
 
 
 def validate_gif_input_dir(gif_input_dir: Path) -> None:
-    if not gif_input_dir.exists():
+    mode: int | None = _stat_mode(gif_input_dir)
+    if mode is None:
         raise FileNotFoundError(
             f"GifInputDir path '{gif_input_dir}' "
             f"does not exist. Are you sure this is the right location?"
         )
 
     # gif_input_dir should be a directory
-    if not gif_input_dir.is_dir():
+    if not stat.S_ISDIR(mode):
         raise ValueError(f"GifInputDir '{gif_input_dir}' " f"is not a directory")
 
-    # gif_input_dir should contain at least one GIF
-    if len(list(gif_input_dir.glob("*.gif"))) == 0:
+    # gif_input_dir should contain at least one GIF, we stop at the first one
+    # instead of listing the whole directory. The same glob as discover_files
+    # is used, so both agree on what a GIF is (e.g. .GIF on Windows).
+    has_gif: bool = next(gif_input_dir.glob("*.gif"), None) is not None
+    if not has_gif:
         raise ValueError(f"GifInputDir '{gif_input_dir}' " f"does not contain any GIFs")
 
 
 def validate_output_dir(output_dir: Path) -> None:
-    if not output_dir.exists():
+    mode: int | None = _stat_mode(output_dir)
+    if mode is None:
         raise FileNotFoundError(
             f"Output path '{output_dir}' "
             f"does not exist. Are you sure this is the right location?"
         )
 
     # output_dir should be a directory
-    if not output_dir.is_dir():
+    if not stat.S_ISDIR(mode):
         raise ValueError(f"Output '{output_dir}' " f"is not a directory")
 
 
@@ -55,20 +80,26 @@ def validate_darkening_factor(darkening_factor: float | int) -> None:
         )
 
 
-def validate_input_colour(light_colour: str | None) -> None:
+def _parse_input_colour(
+    colour: str | None, colour_name: str
+) -> tuple[int, int, int, int] | None:
     # Must be a string or None
-    if not isinstance(light_colour, (str, type(None))):
-        raise TypeError(f"Light colour '{light_colour}' " f"must be a string or None")
+    if not isinstance(colour, (str, type(None))):
+        raise TypeError(
+            f"{colour_name.capitalize()} '{colour}' " f"must be a string or None"
+        )
 
-    if light_colour is None:
-        return
+    if colour is None:
+        return None
 
     try:
-        parse_colour(light_colour)
+        return parse_colour(colour)
     except argparse.ArgumentTypeError as e:
-        raise argparse.ArgumentTypeError(
-            f"Invalid light colour '{light_colour}'. " f"{e}"
-        )
+        raise argparse.ArgumentTypeError(f"Invalid {colour_name} '{colour}'. " f"{e}")
+
+
+def validate_input_colour(light_colour: str | None) -> None:
+    _parse_input_colour(light_colour, "light colour")
 
 
 def validate_replacement_colour(
@@ -77,6 +108,12 @@ def validate_replacement_colour(
     default_color: str,
     argument_name: str,
 ) -> tuple[int, int, int, int] | None:
+    # The given colour is validated and parsed once, before the other checks
+    # so an invalid colour is reported first
+    parsed_colour: tuple[int, int, int, int] | None = _parse_input_colour(
+        replacement_colour, argument_name.replace("_", " ")
+    )
+
     if discover_colours and replacement_colour is not None:
         raise argparse.ArgumentTypeError(
             "You cannot specify both --discover-colours and "
@@ -95,10 +132,12 @@ def validate_replacement_colour(
             f"Using default colour: {default_color}.",
             file=sys.stderr,
         )
+        # The built-in defaults are already parsed
+        if default_color in _PARSED_DEFAULT_COLOURS:
+            return _PARSED_DEFAULT_COLOURS[default_color]
         return parse_colour(default_color)
 
-    if replacement_colour is not None:
-        return parse_colour(replacement_colour)
+    return parsed_colour
 
 
 def validate_args(args: argparse.Namespace) -> None:
@@ -123,25 +162,35 @@ def validate_args(args: argparse.Namespace) -> None:
 
     validate_darkening_factor(args.darkening)
 
-    # Validate colours
-    validate_input_colour(args.light_colour)
-    validate_input_colour(args.dark_colour)
-
-    # We need to specify both light_colour and dark_colour if we want to
-    # override the colour discovery step
-    default_light_colour = "128,128,255,255"
-    default_dark_colour = "0,0,255,255"
-
+    # Validate and parse the colours. We need to specify both light_colour and
+    # dark_colour if we want to override the colour discovery step
     args.light_colour = validate_replacement_colour(
-        args.light_colour, args.discover_colours, default_light_colour, "light_colour"
+        args.light_colour, args.discover_colours, _DEFAULT_LIGHT_COLOUR, "light_colour"
     )
 
     args.dark_colour = validate_replacement_colour(
-        args.dark_colour, args.discover_colours, default_dark_colour, "dark_colour"
+        args.dark_colour, args.discover_colours, _DEFAULT_DARK_COLOUR, "dark_colour"
     )
 
 
 def parse_colour(colour_str: str) -> tuple[int, int, int, int]:
+    # Well-formed colours are matched with one regex call, everything else
+    # goes through the checks below to get the right error message
+    match: re.Match | None = _COLOUR_RE.fullmatch(colour_str)
+    if match is not None:
+        red, green, blue, alpha = match.groups("255")
+        colour: tuple[int, int, int, int] = (
+            int(red),
+            int(green),
+            int(blue),
+            int(alpha),
+        )
+        if max(colour) > 255:
+            raise argparse.ArgumentTypeError(
+                "Colour values must be in the range of 0-255."
+            )
+        return colour
+
     colour_values = colour_str.split(",")
     if len(colour_values) not in [3, 4]:
         raise argparse.ArgumentTypeError(
@@ -165,4 +214,11 @@ def parse_colour(colour_str: str) -> tuple[int, int, int, int]:
     return colour_ints[0], colour_ints[1], colour_ints[2], alpha
 
 
+# The default colours are parsed once, when the module is imported
+_PARSED_DEFAULT_COLOURS: dict[str, tuple[int, int, int, int]] = {
+    colour: parse_colour(colour)
+    for colour in (_DEFAULT_LIGHT_COLOUR, _DEFAULT_DARK_COLOUR)
+}
+
+
 __all__ = ["validate_args"]
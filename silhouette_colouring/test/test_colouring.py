@@ -4,12 +4,26 @@ This module contains the unit tests for the silhouette_colouring module.
 
 __author__ = "Sander J. Bouwman"
 
+import io
+import tempfile
 import unittest
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
+from PIL import Image
 
-from silhouette_colouring.src.utils import csv_is_valid, hex_to_rgb, \
-    darken_color
+from silhouette_colouring.src.kernels import _recolour_pixels_numpy, recolour_pixels
+from silhouette_colouring.src.utils import (
+    csv_is_valid,
+    hex_to_rgb,
+    darken_color,
+    change_color,
+    change_palette_color,
+    read_gif_palette,
+    discover_colours,
+    recolour_file,
+)
 
 
 class testColouring(unittest.TestCase):
@@ -53,6 +67,227 @@ class testColouring(unittest.TestCase):
         self.assertLess(darkened_light_blue[1], light_blue[1])
         self.assertLess(darkened_light_blue[2], light_blue[2])
 
+        # Floats are rejected, also after the same integer colour was cached
+        darken_color(255, 0, 0, darken_factor)
+        with self.assertRaises(TypeError):
+            darken_color(255.0, 0, 0, darken_factor)
+
+    def test_change_color(self) -> None:
+        light = (128, 128, 255, 255)
+        dark = (0, 0, 255, 255)
+        background = (255, 255, 255, 255)
+        data = np.array([[light, dark, background]], dtype=np.uint8)
+        image = Image.fromarray(data, mode="RGBA")
+
+        coloured = np.array(change_color(image, "#FF0000", 0.2, light, dark))
+
+        self.assertEqual((255, 0, 0, 255), tuple(coloured[0, 0]))
+        self.assertEqual((204, 0, 0, 255), tuple(coloured[0, 1]))
+        self.assertEqual(background, tuple(coloured[0, 2]))
+
+    def test_recolour_pixels(self) -> None:
+        light, dark, background = np.uint32(1), np.uint32(2), np.uint32(3)
+        new_light, new_dark = np.uint32(10), np.uint32(20)
+        pixels = np.array([light, dark, background, light], dtype=np.uint32)
+        # The pixels Pillow hands over are read-only
+        pixels.setflags(write=False)
+
+        cases = [
+            # current light, current dark, expected pixels, expected flags
+            [light, dark, [10, 20, 3, 10], (True, True)],
+            [light, np.uint32(4), [10, 2, 3, 10], (True, False)],
+            [np.uint32(4), dark, [1, 20, 3, 1], (False, True)],
+            [np.uint32(4), np.uint32(5), [1, 2, 3, 1], (False, False)],
+            # If both colours are the same, the light colour wins
+            [light, light, [10, 2, 3, 10], (True, True)],
+        ]
+        for current_light, current_dark, expected, flags in cases:
+            with self.subTest(current_light=current_light, current_dark=current_dark):
+                # The NumPy fallback and the (Numba) kernel must agree
+                for kernel in (_recolour_pixels_numpy, recolour_pixels):
+                    out = np.empty_like(pixels)
+                    found = kernel(
+                        pixels, out, current_light, current_dark, new_light, new_dark
+                    )
+                    self.assertEqual(expected, out.tolist())
+                    self.assertEqual(flags, tuple(found))
+
+    def test_change_palette_color(self) -> None:
+        light = (128, 128, 255, 255)
+        dark = (0, 0, 255, 255)
+        background = (255, 255, 255, 255)
+        image = Image.new("P", (3, 1))
+        image.putpalette([*background[:3], *light[:3], *dark[:3]])
+        image.putdata([1, 2, 0])
+
+        coloured = change_palette_color(image, "#FF0000", 0.2, light, dark)
+
+        self.assertEqual("P", coloured.mode)
+        self.assertEqual([1, 2, 0], np.array(coloured)[0].tolist())
+        self.assertEqual(
+            [[255, 0, 0, 255], [204, 0, 0, 255], list(background)],
+            np.array(coloured.convert("RGBA"))[0].tolist(),
+        )
+        # The input image is left untouched
+        self.assertEqual(light[:3], tuple(image.getpalette()[3:6]))
+
+        # If the light and dark colour are the same, the light colour wins
+        coloured = change_palette_color(image, "#FF0000", 0.5, light, light)
+        self.assertEqual(
+            [255, 0, 0, 255], np.array(coloured.convert("RGBA"))[0, 0].tolist()
+        )
+
+    def test_palette_and_rgba_paths_agree(self) -> None:
+        # The transparent background is recoloured, which makes it opaque
+        transparent = (255, 255, 255, 0)
+        dark = (0, 0, 255, 255)
+        image = Image.new("P", (3, 1))
+        image.putpalette([255, 255, 255, *dark[:3], 128, 128, 255])
+        image.putdata([0, 1, 2])
+        image.info["transparency"] = 0
+
+        coloured_palette = change_palette_color(
+            image, "#FF0000", 0.2, transparent, dark
+        )
+        coloured_rgba = change_color(
+            image.convert("RGBA"), "#FF0000", 0.2, transparent, dark
+        )
+        self.assertEqual(
+            [[255, 0, 0, 255], [204, 0, 0, 255], [128, 128, 255, 255]],
+            np.array(coloured_rgba)[0].tolist(),
+        )
+        self.assertEqual(
+            np.array(coloured_rgba).tolist(),
+            np.array(coloured_palette.convert("RGBA")).tolist(),
+        )
+
+    def test_read_gif_palette(self) -> None:
+        image = Image.new("P", (2, 1))
+        image.putpalette([255, 255, 255, 128, 128, 255])
+        image.putdata([0, 1])
+        buffer = io.BytesIO()
+        image.save(buffer, format="GIF", transparency=0)
+
+        offset, palette = read_gif_palette(buffer.getvalue())
+        self.assertEqual(13, offset)
+        self.assertEqual([255, 255, 255, 0], palette[0].tolist())
+        self.assertEqual([128, 128, 255, 255], palette[1].tolist())
+
+        # A transparent index past the colour table is ignored
+        data = bytearray(buffer.getvalue())
+        gce = data.index(b"\x21\xf9\x04")
+        data[gce + 6] = 200
+        offset, palette = read_gif_palette(bytes(data))
+        self.assertEqual(4, len(palette))
+        self.assertEqual([255] * 4, palette[:, 3].tolist())
+
+        # Animated GIFs are not supported
+        second_frame = image.copy()
+        second_frame.putdata([1, 0])
+        buffer = io.BytesIO()
+        image.save(buffer, format="GIF", save_all=True, append_images=[second_frame])
+        self.assertIsNone(read_gif_palette(buffer.getvalue()))
+
+        # Neither are other files
+        self.assertIsNone(read_gif_palette(b"cell_ID,cluster,color"))
+
+    def test_discover_colours(self) -> None:
+        light = (128, 128, 255, 255)
+        dark = (0, 0, 255, 255)
+        background = (255, 255, 255, 255)
+        data = np.array([[background] * 6 + [light] * 4 + [dark] * 2], dtype=np.uint8)
+        # Add more than 256 other colours, which getcolors(256) cannot count
+        noise = np.stack(
+            [
+                np.arange(300) % 256,
+                np.arange(300) // 256,
+                np.full(300, 7),
+                np.full(300, 255),
+            ],
+            axis=-1,
+        ).astype(np.uint8)
+        data = np.concatenate([data, noise[np.newaxis]], axis=1)
+        image = Image.fromarray(data, mode="RGBA")
+        self.assertEqual((light, dark), discover_colours(image))
+
+        palette_image = Image.new("P", (6, 1))
+        palette_image.putpalette([*dark[:3], *background[:3], *light[:3]])
+        palette_image.putdata([1, 1, 1, 2, 2, 0])
+        self.assertEqual((light, dark), discover_colours(palette_image))
+
+        # A colour stored in two palette entries is counted once, in total
+        palette_image = Image.new("P", (11, 1))
+        palette_image.putpalette([*background[:3], *light[:3], *dark[:3], *dark[:3]])
+        palette_image.putdata([0] * 6 + [1, 1, 2, 3, 3])
+        self.assertEqual((dark, light), discover_colours(palette_image))
+
+    def test_recolour_file(self) -> None:
+        light = (128, 128, 255, 255)
+        dark = (0, 0, 255, 255)
+        missing = (1, 2, 3, 255)
+        image = Image.new("P", (3, 1))
+        image.putpalette([255, 255, 255, *light[:3], *dark[:3]])
+        image.putdata([0, 1, 2])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            gif_path = Path(tmp_dir) / "cell-sil.gif"
+            image.save(gif_path, format="GIF", transparency=0)
+            output_path = Path(tmp_dir) / "cell-colored.gif"
+
+            exit_code = recolour_file(
+                gif_path, "#FF0000", output_path, 0.2, light, dark, False, False
+            )
+            self.assertEqual(0, exit_code)
+            # Only the colour table is rewritten, the rest of the file is kept
+            self.assertEqual(gif_path.stat().st_size, output_path.stat().st_size)
+            with Image.open(output_path) as coloured:
+                self.assertEqual(0, coloured.info["transparency"])
+                self.assertEqual(
+                    [[255, 255, 255, 0], [255, 0, 0, 255], [204, 0, 0, 255]],
+                    np.array(coloured.convert("RGBA"))[0].tolist(),
+                )
+
+            # Recolouring the transparent entry makes it opaque, like it does
+            # for RGBA images
+            output_path.unlink()
+            exit_code = recolour_file(
+                gif_path,
+                "#FF0000",
+                output_path,
+                0.2,
+                (255, 255, 255, 0),
+                dark,
+                False,
+                False,
+            )
+            self.assertEqual(0, exit_code)
+            with Image.open(output_path) as coloured:
+                self.assertNotIn("transparency", coloured.info)
+                self.assertEqual(
+                    [[255, 0, 0, 255], [128, 128, 255, 255], [204, 0, 0, 255]],
+                    np.array(coloured.convert("RGBA"))[0].tolist(),
+                )
+
+            # Images without the light or dark colour are skipped
+            output_path.unlink()
+            for current_light, current_dark, expected in [
+                [missing, dark, 2],
+                [light, missing, 3],
+            ]:
+                with self.subTest(expected=expected):
+                    exit_code = recolour_file(
+                        gif_path,
+                        "#FF0000",
+                        output_path,
+                        0.2,
+                        current_light,
+                        current_dark,
+                        False,
+                        False,
+                    )
+                    self.assertEqual(expected, exit_code)
+                    self.assertFalse(output_path.exists())
+
     def test_csv_validator(self) -> None:
         # Should be valid
         # Create a dataframe with the correct columns "cell_ID", "cluster", "color"
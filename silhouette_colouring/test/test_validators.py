@@ -1,4 +1,5 @@
 import argparse
+import tempfile
 import unittest
 from pathlib import Path
 
@@ -11,12 +12,23 @@ from silhouette_colouring.src.validators import (
     validate_replacement_colour,
     parse_colour,
 )
+from silhouette_colouring.src.utils import discover_files
+
+# The test files are looked up next to this module, so the tests do not depend
+# on the directory they are run from
+_TEST_FILES: Path = Path(__file__).resolve().parent / "test_files"
+_TEST_CSV: Path = _TEST_FILES / "test_csv.csv"
+_FAULTY_FILETYPE: Path = _TEST_FILES / "faulty_filetype.txt"
+_TEST_IMAGES: Path = _TEST_FILES / "test_images"
+_GIF_FILE: Path = _TEST_IMAGES / "file.gif"
+_OUTPUT_DIR: Path = _TEST_IMAGES / "SilhouetteOutput"
+_EMPTY_DIR: Path = _TEST_FILES / "empty_dir"
+_NONEXISTENT_DIR: Path = _TEST_FILES / "some_nonexistent_dir"
 
 
 class TestScript(unittest.TestCase):
     def test_validate_input_csv_exists(self):
-        input_csv = Path("silhouette_colouring/test/test_files/test_csv.csv")
-        self.assertIsNone(validate_input_csv(input_csv))
+        self.assertIsNone(validate_input_csv(_TEST_CSV))
 
     def test_validate_input_csv_not_exists(self):
         input_csv = Path("nonexistent/file.csv")
@@ -24,52 +36,45 @@ class TestScript(unittest.TestCase):
             validate_input_csv(input_csv)
 
     def test_validate_input_csv_not_csv_file(self):
-        input_csv = Path("silhouette_colouring/test/test_files/faulty_filetype.txt")
         with self.assertRaises(ValueError):
-            validate_input_csv(input_csv)
+            validate_input_csv(_FAULTY_FILETYPE)
 
     def test_validate_gif_input_dir_exists(self):
-        gif_input_dir = Path("silhouette_colouring/test/test_files/test_images")
-        self.assertIsNone(validate_gif_input_dir(gif_input_dir))
+        self.assertIsNone(validate_gif_input_dir(_TEST_IMAGES))
 
     def test_validate_gif_input_dir_not_exists(self):
-        gif_input_dir = Path(
-            "silhouette_colouring/test/test_files" "/some_nonexistent_dir"
-        )
         with self.assertRaises(FileNotFoundError):
-            validate_gif_input_dir(gif_input_dir)
+            validate_gif_input_dir(_NONEXISTENT_DIR)
 
     def test_validate_gif_input_dir_not_directory(self):
-        gif_input_dir = Path(
-            "silhouette_colouring/test" "/test_files/test_images/file.gif"
-        )
         with self.assertRaises(ValueError):
-            validate_gif_input_dir(gif_input_dir)
+            validate_gif_input_dir(_GIF_FILE)
 
     def test_validate_gif_input_dir_no_gifs(self):
-        gif_input_dir = Path("silhouette_colouring/test/test_files/empty_dir")
         with self.assertRaises(ValueError):
-            validate_gif_input_dir(gif_input_dir)
+            validate_gif_input_dir(_EMPTY_DIR)
+
+    def test_validate_gif_input_dir_upper_case_gif(self):
+        # Only accepted where discover_files also finds it (e.g. on Windows)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            gif_input_dir = Path(tmp_dir)
+            (gif_input_dir / "CELL-sil.GIF").touch()
+            if discover_files(gif_input_dir, "*.gif"):
+                self.assertIsNone(validate_gif_input_dir(gif_input_dir))
+            else:
+                with self.assertRaises(ValueError):
+                    validate_gif_input_dir(gif_input_dir)
 
     def test_validate_output_dir_exists(self):
-        output_dir = Path(
-            "silhouette_colouring/test/test_files" "/test_images/SilhouetteOutput"
-        )
-        self.assertIsNone(validate_output_dir(output_dir))
+        self.assertIsNone(validate_output_dir(_OUTPUT_DIR))
 
     def test_validate_output_dir_not_exists(self):
-        output_dir = Path(
-            "silhouette_colouring/test/test_files" "/some_nonexistent_dir"
-        )
         with self.assertRaises(FileNotFoundError):
-            validate_output_dir(output_dir)
+            validate_output_dir(_NONEXISTENT_DIR)
 
     def test_validate_output_dir_not_directory(self):
-        output_dir = Path(
-            "silhouette_colouring/test" "/test_files/test_images/file.gif"
-        )
         with self.assertRaises(ValueError):
-            validate_output_dir(output_dir)
+            validate_output_dir(_GIF_FILE)
 
     def test_validate_darkening_factor_valid(self):
         darkening_factors = [0.5, 0.75, 1.0, 1, 0]
@@ -106,7 +111,8 @@ class TestScript(unittest.TestCase):
         invalid_colours = [
             "255,255,255,255,255",
             "0,0,0,0,0",
-            "128,128,-10" "255,280,0",
+            "128,128,-10",
+            "255,280,0",
             "256,0,0",
         ]
 
@@ -154,6 +160,31 @@ class TestScript(unittest.TestCase):
         expected_result = parse_colour(default_color)
         self.assertEqual(result, expected_result)
 
+    def test_parse_colour(self):
+        colours = [
+            ["128,128,255", (128, 128, 255, 255)],
+            ["0,0,255,0", (0, 0, 255, 0)],
+            ["255,255,255,255", (255, 255, 255, 255)],
+            # Not matched by the regex, but accepted by int()
+            [" 1,2,3", (1, 2, 3, 255)],
+        ]
+        for colour in colours:
+            with self.subTest(colour=colour[0]):
+                self.assertEqual(colour[1], parse_colour(colour[0]))
+
+        invalid_colours = [
+            ["1,2", "3 or 4"],
+            ["1,2,3,4,5", "3 or 4"],
+            ["a,b,c", "integers"],
+            ["256,0,0", "range"],
+            ["0,0,1000", "range"],
+            ["-1,0,0", "range"],
+        ]
+        for colour in invalid_colours:
+            with self.subTest(colour=colour[0]):
+                with self.assertRaisesRegex(argparse.ArgumentTypeError, colour[1]):
+                    parse_colour(colour[0])
+
 
 if __name__ == "__main__":
     unittest.main()